@@ -6,6 +6,11 @@ import io
 import math
 import re
 
+from smart_worker import submit_job, job_result, show_progress, poll_pending, bytes_key, frame_key
+from smart_cache import get_shared_cache, show_cache_stats
+from smart_store import save_snapshot, record_schedule, latest_snapshot_id, load_snapshot, show_history_panel
+from smart_ingest import ingest_files, show_ingest_timings
+
 # --- 1. KONFIGURASI HALAMAN ---
 st.set_page_config(page_title="Smart Schedule Dashboard", layout="wide")
 
@@ -38,18 +43,19 @@ def determine_tier(bopd):
     except:
         return 'Tier 3'
 
-def preprocess_uploaded_data(df):
+def preprocess_uploaded_data(df, notify=True):
     """
     Mendeteksi apakah ini Format Excel Baru (Kompleks) atau Format Template Lama.
     Lalu mengubahnya menjadi standar kolom: 
     ['Job_ID', 'Rig_Name', 'Activity', 'Duration_Days', 'Priority_Tier', 'Has_Constraint', 'Constraint_Note']
+    notify=False dipakai saat jalan di background worker (tanpa akses ke UI).
     """
     cols = df.columns
     new_data = []
 
     # Cek apakah ini Format Excel DATA_FULL (Format Baru)
     if 'HSRIG_NAME' in cols and 'PROG CODE' in cols:
-        st.toast("Mendeteksi Format Data: Full Dynamic Equipment", icon="ℹ️")
+        if notify: st.toast("Mendeteksi Format Data: Full Dynamic Equipment", icon="ℹ️")
         for _, row in df.iterrows():
             # Logic Mapping
             duration = parse_duration(row.get('Total Eksekusi (Jam/Hari)', 1))
@@ -72,11 +78,11 @@ def preprocess_uploaded_data(df):
     
     # Jika Format Template Lama (Standard)
     elif 'Job_ID' in cols and 'Rig_Name' in cols:
-        st.toast("Mendeteksi Format Data: Template Standard", icon="ℹ️")
+        if notify: st.toast("Mendeteksi Format Data: Template Standard", icon="ℹ️")
         return df
     
     else:
-        st.error("Format kolom Excel tidak dikenali. Pastikan ada 'HSRIG_NAME' atau 'Rig_Name'.")
+        if notify: st.error("Format kolom Excel tidak dikenali. Pastikan ada 'HSRIG_NAME' atau 'Rig_Name'.")
         return pd.DataFrame()
 
 def generate_dummy_data():
@@ -92,11 +98,12 @@ def generate_dummy_data():
     }
     return pd.DataFrame(data)
 
-def run_smart_schedule(df):
+def run_smart_schedule(df, progress=None):
     """
     Engine Penjadwalan:
     1. Sort by Constraint (No dulu), lalu Priority (Tier 1 dulu).
     2. Alokasi waktu tanpa overlap per Rig.
+    progress: callback opsional progress(fraksi) untuk background worker.
     """
     if df.empty: return df
 
@@ -112,7 +119,10 @@ def run_smart_schedule(df):
     start_date_base = datetime.now().date() + timedelta(days=1)
     rig_availability = {} 
 
-    for index, row in df.iterrows():
+    total_rows = len(df)
+    for i, (index, row) in enumerate(df.iterrows()):
+        if progress and i % 200 == 0: progress(i / total_rows)
+
         rig = row['Rig_Name']
         duration = int(row['Duration_Days'])
         
@@ -137,28 +147,69 @@ def run_smart_schedule(df):
         
     return pd.DataFrame(schedule_list)
 
+def load_excel_job(job, files):
+    """Background job: baca semua file & sheet paralel, mapping kolom, gabung (dedup Job_ID)."""
+    normalize = lambda df: preprocess_uploaded_data(df, notify=False)
+    return ingest_files(job, files, normalize, cache_ns='Revisi', dedup_col='Job_ID')
+
+def schedule_job(job, df):
+    """Background job: jalankan engine + siapkan file export (shared cache per data & tanggal)."""
+    # Kunci cache dihitung dari frame yang benar-benar masuk engine (isi + urutan baris),
+    # karena engine memecah tie berdasarkan urutan input
+    key = ('Revisi', 'schedule', frame_key(df), datetime.now().date())
+    def schedule():
+        job.report(0.05, "Menjalankan engine penjadwalan...")
+        df_scheduled = run_smart_schedule(df, progress=lambda f: job.report(0.05 + 0.75 * f))
+        job.report(0.8, "Menyiapkan file export...")
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df_scheduled.to_excel(writer, index=False)
+        return df_scheduled, output.getvalue()
+    return get_shared_cache().get_or_compute(key, schedule)
+
 # --- 3. SESSION STATE ---
+# Muat snapshot terakhir dari store lokal; data dummy hanya kalau belum ada riwayat
 if 'main_data' not in st.session_state:
-    st.session_state['main_data'] = generate_dummy_data()
+    latest_id = latest_snapshot_id('Revisi')
+    st.session_state['main_data'] = load_snapshot(latest_id) if latest_id else generate_dummy_data()
+    st.session_state['snapshot_id'] = latest_id
+if 'snapshot_scheduled' not in st.session_state:
+    st.session_state['snapshot_scheduled'] = None
+if 'ingest_timings' not in st.session_state:
+    st.session_state['ingest_timings'] = None
+if 'applied_upload' not in st.session_state:
+    st.session_state['applied_upload'] = None
 
 # --- 4. SIDEBAR INPUT ---
 st.sidebar.header("🛠️ Input & Resource Tools")
 
 # Upload Excel
-uploaded_file = st.sidebar.file_uploader("1. Import Data Excel (.xlsx)", type=['xlsx', 'xls'])
-if uploaded_file is not None:
-    try:
-        # Baca Excel
-        df_raw = pd.read_excel(uploaded_file)
-        # Preprocess (Mapping kolom otomatis)
-        df_clean = preprocess_uploaded_data(df_raw)
-        
-        if not df_clean.empty:
-            st.session_state['main_data'] = df_clean
-            st.sidebar.success(f"Berhasil load {len(df_clean)} pekerjaan!")
-            
-    except Exception as e:
-        st.sidebar.error(f"Error membaca file: {e}")
+uploaded_files = st.sidebar.file_uploader("1. Import Data Excel (.xlsx, boleh beberapa file)", type=['xlsx', 'xls'], accept_multiple_files=True)
+if uploaded_files:
+    # Baca Excel + Preprocess (Mapping kolom otomatis) di background,
+    # hasilnya diterapkan sekali per upload supaya job manual tidak tertimpa saat rerun.
+    files = [(f.name, f.getvalue()) for f in uploaded_files]
+    upload_key = tuple(bytes_key(data) for _, data in files)
+    if st.session_state['applied_upload'] != upload_key:
+        submit_job('upload', load_excel_job, files, params_key=upload_key)
+        upload_res, done_key, upload_pending, upload_error = job_result('upload')
+        if upload_error is not None:
+            st.sidebar.error(f"Error membaca file: {upload_error}")
+        elif upload_pending is not None:
+            show_progress(upload_pending, st.sidebar)
+        elif done_key == upload_key:
+            df_clean, st.session_state['ingest_timings'] = upload_res
+            st.session_state['applied_upload'] = upload_key
+            if not df_clean.empty:
+                st.session_state['main_data'] = df_clean
+                label = "upload: " + ", ".join(name for name, _ in files)
+                st.session_state['snapshot_id'] = save_snapshot('Revisi', df_clean, label=label)
+                st.sidebar.success(f"Berhasil load {len(df_clean)} pekerjaan dari {len(files)} file!")
+            else:
+                st.sidebar.error("Format kolom Excel tidak dikenali. Pastikan ada 'HSRIG_NAME' atau 'Rig_Name'.")
+show_ingest_timings(st.session_state['ingest_timings'], st.sidebar)
+
+show_cache_stats(st.sidebar)
 
 st.sidebar.markdown("---")
 
@@ -184,13 +235,44 @@ with st.sidebar.form(key='add_job_form'):
             'Has_Constraint': new_constraint, 'Constraint_Note': new_note
         }
         st.session_state['main_data'] = pd.concat([st.session_state['main_data'], pd.DataFrame([new_row])], ignore_index=True)
+        st.session_state['snapshot_id'] = save_snapshot('Revisi', st.session_state['main_data'], label=f"manual: {new_job_id}")
         st.success("Job ditambahkan.")
 
 # --- 5. VISUALISASI UTAMA ---
 st.title("🚜 Smart Schedule Dashboard v2.0")
 
-# Run Logic Scheduling
-df_scheduled = run_smart_schedule(st.session_state['main_data'])
+def render_history_panel():
+    """Panel riwayat snapshot; bisa memulihkan snapshot lama ke main_data."""
+    restored = show_history_panel('Revisi')
+    if restored is not None:
+        st.session_state['main_data'] = restored
+        st.session_state['snapshot_id'] = save_snapshot('Revisi', restored, label="restore")
+        st.rerun()
+
+# Run Logic Scheduling (background + debounce di session); jadwal terakhir tetap tampil selama menghitung
+main_data = st.session_state['main_data']
+data_key = frame_key(main_data)
+submit_job('schedule', schedule_job, main_data.copy(), params_key=data_key, debounce=0.3)
+schedule_res, schedule_key, schedule_pending, schedule_error = job_result('schedule')
+show_progress(schedule_pending)
+if schedule_error is not None:
+    st.error(f"Terjadi kesalahan pada engine penjadwalan: {schedule_error}")
+
+# Simpan output engine begitu jadwal untuk data ini selesai. Snapshot yang sudah
+# punya jadwal tidak ditimpa; hasil hitung ulang yang berbeda jadi snapshot baru.
+snapshot_id = st.session_state['snapshot_id']
+if (snapshot_id and schedule_res is not None and schedule_key == data_key
+        and st.session_state['snapshot_scheduled'] != snapshot_id):
+    snapshot_id = record_schedule('Revisi', snapshot_id, main_data, schedule_res[0])
+    st.session_state['snapshot_id'] = snapshot_id
+    st.session_state['snapshot_scheduled'] = snapshot_id
+if schedule_res is None:
+    # Belum ada jadwal (masih dihitung / engine error): chart & export dilewati,
+    # tapi riwayat snapshot tetap tampil supaya snapshot yang baik bisa dipulihkan
+    render_history_panel()
+    poll_pending()
+    st.stop()
+df_scheduled, export_bytes = schedule_res
 
 # Tampilkan Gantt Chart
 st.subheader("📅 Timeline Schedule")
@@ -228,7 +310,9 @@ with c2:
         st.warning(f"Ada {constrained} pekerjaan pending karena constraint (Material/Cuaca/Izin).")
 
 # Download Button
-output = io.BytesIO()
-with pd.ExcelWriter(output, engine='openpyxl') as writer:
-    df_scheduled.to_excel(writer, index=False)
-st.download_button("📥 Download Jadwal (.xlsx)", data=output.getvalue(), file_name='smart_schedule_final.xlsx')
\ No newline at end of file
+st.download_button("📥 Download Jadwal (.xlsx)", data=export_bytes, file_name='smart_schedule_final.xlsx')
+
+# --- 7. RIWAYAT SNAPSHOT ---
+render_history_panel()
+
+poll_pending()
\ No newline at end of file
@@ -6,6 +6,11 @@ import io
 import math
 import re
 
+from smart_worker import submit_job, job_result, clear_result, show_progress, poll_pending, bytes_key, frame_key
+from smart_cache import get_shared_cache, show_cache_stats
+from smart_store import save_snapshot, record_schedule, latest_snapshot_id, load_snapshot, show_history_panel
+from smart_ingest import ingest_files, drop_duplicate_jobs, show_ingest_timings
+
 # --- 1. CONFIG ---
 st.set_page_config(page_title="Smart Scheduler - Duration Logic", layout="wide")
 
@@ -41,7 +46,7 @@ def generate_major_minor_color(category, bopd, max_bopd):
 
 def preprocess_data(df):
     new_data = []
-    df.columns = [c.strip() for c in df.columns]
+    df.columns = [str(c).strip() for c in df.columns]
 
     # READ EXCEL
     if 'HSRIG_NAME' in df.columns:
@@ -98,7 +103,7 @@ def preprocess_data(df):
     return pd.DataFrame(new_data)
 
 # --- 3. SMART ENGINE (LOGIC BARU) ---
-def run_smart_engine(df, oil_price):
+def run_smart_engine(df, oil_price, progress=None):
     if df.empty: return pd.DataFrame()
 
     df['Constraint_Score'] = df['Has_Constraint'].apply(lambda x: 1 if x == 'Yes' else 0)
@@ -116,7 +121,11 @@ def run_smart_engine(df, oil_price):
     rig_timeline = {}
     base_start = datetime.now().date() + timedelta(days=1)
 
-    for _, row in df_sorted.iterrows():
+    total_rows = len(df_sorted)
+    for i, (_, row) in enumerate(df_sorted.iterrows()):
+        # Laporan progress (juga titik cek pembatalan kalau jalan di background)
+        if progress and i % 200 == 0: progress(i / total_rows)
+
         rig = row['Rig_Name']
         duration = int(row['Duration_Days'])
         
@@ -159,29 +168,84 @@ def run_smart_engine(df, oil_price):
         
     return pd.DataFrame(schedule_list)
 
+# --- 3b. BACKGROUND JOBS ---
+# Hasil disimpan di shared cache (kunci: hash workbook / data + parameter engine),
+# jadi session lain dengan file & parameter sama tidak menghitung ulang.
+# Placeholder Job_ID dari preprocess_data saat ID tidak ada di sumber; bukan ID asli
+NO_KEY_IDS = ('UNK', '-')
+
+def load_excel_job(job, files):
+    # Semua file & sheet dibaca paralel, dinormalisasi, lalu digabung (dedup Job_ID)
+    return ingest_files(job, files, preprocess_data, cache_ns='Revisi3', dedup_col='Job_ID', no_key=NO_KEY_IDS)
+
+def schedule_job(job, df, oil_price):
+    # Kunci cache dihitung dari frame yang benar-benar masuk engine (isi + urutan baris,
+    # engine memecah tie berdasarkan urutan input). Tanggal ikut jadi kunci karena
+    # jadwal dimulai dari besok.
+    key = ('Revisi3', 'schedule', frame_key(df), oil_price, datetime.now().date())
+
+    def schedule():
+        job.report(0.05, "Menjalankan Smart Engine...")
+        df_final = run_smart_engine(df, oil_price, progress=lambda f: job.report(0.05 + 0.75 * f))
+        job.report(0.8, "Menyiapkan file export...")
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine='openpyxl') as writer: 
+            df_final.to_excel(writer, index=False, sheet_name="Full Schedule")
+        return df_final, buf.getvalue()
+    return get_shared_cache().get_or_compute(key, schedule)
+
 # --- 4. STATE ---
+# Session baru langsung memuat snapshot terakhir dari store lokal
 if 'main_data' not in st.session_state:
-    st.session_state['main_data'] = pd.DataFrame()
+    latest_id = latest_snapshot_id('Revisi3')
+    st.session_state['main_data'] = load_snapshot(latest_id) if latest_id else pd.DataFrame()
+    st.session_state['snapshot_id'] = latest_id
+if 'snapshot_scheduled' not in st.session_state:
+    st.session_state['snapshot_scheduled'] = None
+if 'ingest_timings' not in st.session_state:
+    st.session_state['ingest_timings'] = None
 if 'last_updated_job' not in st.session_state:
     st.session_state['last_updated_job'] = None
+if 'applied_upload' not in st.session_state:
+    st.session_state['applied_upload'] = None
 
 # --- 5. SIDEBAR ---
 st.sidebar.title("🛠️ Control Panel")
 if st.sidebar.button("🗑️ Reset Data"):
     st.session_state['main_data'] = pd.DataFrame()
     st.session_state['last_updated_job'] = None
+    st.session_state['snapshot_id'] = save_snapshot('Revisi3', st.session_state['main_data'], label="reset")
+    clear_result('schedule')
     st.rerun()
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("💲 Parameter Ekonomi")
 oil_price_input = st.sidebar.number_input("Harga Minyak (USD/Barel)", min_value=0.0, value=65.0, step=0.1)
 
-uploaded = st.sidebar.file_uploader("1. Import Excel", type=['xlsx'])
+uploaded = st.sidebar.file_uploader("1. Import Excel (boleh beberapa file / area)", type=['xlsx'], accept_multiple_files=True)
 if uploaded:
-    df_raw = pd.read_excel(uploaded)
-    df_clean = preprocess_data(df_raw)
-    if not df_clean.empty:
-        st.session_state['main_data'] = pd.concat([st.session_state['main_data'], df_clean], ignore_index=True)
+    # Parse di background; hasil tiap upload hanya digabung sekali (bukan di setiap rerun)
+    files = [(f.name, f.getvalue()) for f in uploaded]
+    upload_key = tuple(bytes_key(data) for _, data in files)
+    if st.session_state['applied_upload'] != upload_key:
+        submit_job('upload', load_excel_job, files, params_key=upload_key)
+        upload_res, done_key, upload_pending, upload_error = job_result('upload')
+        if upload_error is not None:
+            st.sidebar.error(f"Error membaca file: {upload_error}")
+        elif upload_pending is not None:
+            show_progress(upload_pending, st.sidebar)
+        elif done_key == upload_key:
+            df_clean, st.session_state['ingest_timings'] = upload_res
+            st.session_state['applied_upload'] = upload_key
+            if not df_clean.empty:
+                # Job_ID yang sama dengan data sebelumnya = update (baris terbaru menang)
+                merged = pd.concat([st.session_state['main_data'], df_clean], ignore_index=True)
+                st.session_state['main_data'] = drop_duplicate_jobs(merged, 'Job_ID', NO_KEY_IDS)
+                label = "upload: " + ", ".join(name for name, _ in files)
+                st.session_state['snapshot_id'] = save_snapshot('Revisi3', st.session_state['main_data'], label=label)
+show_ingest_timings(st.session_state['ingest_timings'], st.sidebar)
+
+show_cache_stats(st.sidebar)
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("2. Input / Edit Manual Job")
@@ -215,13 +279,42 @@ with st.sidebar.form("manual_form"):
             
         st.session_state['main_data'] = pd.concat([current_df, proc], ignore_index=True)
         st.session_state['last_updated_job'] = in_job
+        st.session_state['snapshot_id'] = save_snapshot('Revisi3', st.session_state['main_data'], label=f"manual: {in_job}")
         st.rerun()
 
 # --- 6. DASHBOARD ---
 st.title("🚜 Smart Schedule: Value Managed")
 
+# Engine jalan di background (debounce supaya perubahan input beruntun tidak
+# memicu banyak run); selama menghitung, jadwal terakhir yang selesai tetap tampil.
+schedule_res = None
 if not st.session_state['main_data'].empty:
-    df_final = run_smart_engine(st.session_state['main_data'], oil_price_input)
+    main_data = st.session_state['main_data']
+    data_key = frame_key(main_data)
+    submit_job('schedule', schedule_job, main_data.copy(), oil_price_input,
+               params_key=(data_key, oil_price_input), debounce=0.3)
+    schedule_res, schedule_key, schedule_pending, schedule_error = job_result('schedule')
+    show_progress(schedule_pending)
+    if schedule_error is not None:
+        st.error(f"Terjadi kesalahan saat menjalankan Smart Engine: {schedule_error}")
+
+    # Simpan output engine begitu jadwal untuk data ini selesai. Snapshot yang sudah
+    # punya jadwal tidak ditimpa; hasil hitung ulang yang berbeda jadi snapshot baru.
+    snapshot_id = st.session_state['snapshot_id']
+    if (snapshot_id and schedule_res is not None and schedule_key == (data_key, oil_price_input)
+            and st.session_state['snapshot_scheduled'] != snapshot_id):
+        snapshot_id = record_schedule('Revisi3', snapshot_id, main_data, schedule_res[0],
+                                      params={'oil_price': oil_price_input})
+        st.session_state['snapshot_id'] = snapshot_id
+        st.session_state['snapshot_scheduled'] = snapshot_id
+
+if schedule_res is not None:
+    df_final, export_bytes = schedule_res
+    # KPI diberi label harga yang benar-benar dipakai hasil ini (bukan input live),
+    # karena selama debounce / hitung ulang yang tampil adalah hasil sebelumnya
+    result_price = schedule_key[1]
+    if schedule_key != (data_key, oil_price_input):
+        st.caption(f"⏳ Menampilkan hasil sebelumnya (harga ${result_price}); hasil untuk input terbaru sedang dihitung.")
     
     if st.session_state['last_updated_job']:
         last_job = st.session_state['last_updated_job']
@@ -232,7 +325,7 @@ if not st.session_state['main_data'].empty:
 
     # --- KPI METRICS ---
     st.markdown("### 💰 Potential Value Managed (LPO)")
-    st.info(f"Basis Perhitungan Baru: **Durasi Pekerjaan (Hari) x BOPD Real x ${oil_price_input}**")
+    st.info(f"Basis Perhitungan Baru: **Durasi Pekerjaan (Hari) x BOPD Real x ${result_price}**")
     
     total_val_bbls = df_final['Production_Val_Bbls'].sum()
     total_val_usd = df_final['Revenue_Val_USD'].sum()
@@ -242,7 +335,7 @@ if not st.session_state['main_data'].empty:
     
     kpi1.metric("Total Kapasitas BOPD", f"{total_bopd_all:,.0f} Bbls")
     kpi2.metric("Total Volume (Bbls)", f"{total_val_bbls:,.0f} Bbls", help="Akumulasi (Durasi x BOPD) semua job")
-    kpi3.metric("Total Value (USD)", f"${total_val_usd:,.0f}", delta=f"Price: ${oil_price_input}") 
+    kpi3.metric("Total Value (USD)", f"${total_val_usd:,.0f}", delta=f"Price: ${result_price}") 
     kpi4.metric("Total Jobs", f"{len(df_final)}")
     
     st.markdown("---")
@@ -294,11 +387,19 @@ if not st.session_state['main_data'].empty:
         rig_data.index += 1 
         st.dataframe(rig_data[['Start_Date', 'Job_Category', 'Job_ID', 'Has_Constraint', 'BOPD_Value', 'Duration_Days']], use_container_width=True)
 
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine='openpyxl') as writer: 
-        df_final.to_excel(writer, index=False, sheet_name="Full Schedule")
-    st.download_button("📥 Download Excel", buf.getvalue(), "Smart_Schedule_DurationLogic.xlsx")
+    st.download_button("📥 Download Excel", export_bytes, "Smart_Schedule_DurationLogic.xlsx")
 
-else:
+elif st.session_state['main_data'].empty:
     st.warning("Silakan Upload Excel terlebih dahulu.")
+
+# --- 7. RIWAYAT SNAPSHOT ---
+st.markdown("---")
+restored = show_history_panel('Revisi3')
+if restored is not None:
+    st.session_state['main_data'] = restored
+    st.session_state['snapshot_id'] = save_snapshot('Revisi3', restored, label="restore")
+    st.session_state['last_updated_job'] = None
+    st.rerun()
+
+poll_pending()
     
@@ -4,6 +4,10 @@ import altair as alt
 import requests
 from streamlit_lottie import st_lottie
 
+from smart_worker import submit_job, job_result, show_progress, poll_pending, bytes_key
+from smart_cache import show_cache_stats
+from smart_ingest import ingest_files, show_ingest_timings
+
 # --- KONFIGURASI HALAMAN ---
 st.set_page_config(
     page_title="Smart Schedule - Heavy Oil",
@@ -12,6 +16,8 @@ st.set_page_config(
 )
 
 # --- FUNGSI LOAD LOTTIE ANIMATION ---
+# Di-cache supaya rerun (termasuk polling background job) tidak download ulang
+@st.cache_data(show_spinner=False)
 def load_lottieurl(url):
     r = requests.get(url)
     if r.status_code != 200:
@@ -25,6 +31,27 @@ lottie_pump = load_lottieurl("https://lottie.host/5a8b7c4d-9e1f-4g2h-3i4j-5k6l7m
 # Alternatif URL stabil untuk demo machinery:
 lottie_machinery = load_lottieurl("https://assets5.lottiefiles.com/packages/lf20_96bovdur.json")
 
+# --- FUNGSI PARSING (BACKGROUND JOB) ---
+REQUIRED_COLS = ['Total Eksekusi (Jam/Hari)', 'BOPD_RIGDAYS', 'HSRIG_NAME', 'EXECUTION_PLAN_GENERAL']
+
+def parse_sheet(df):
+    # Sheet tanpa kolom wajib (mis. sheet ringkasan) dilewati
+    if not all(c in df.columns for c in REQUIRED_COLS):
+        return pd.DataFrame()
+
+    # 1. Parsing Durasi (Format "1620 Jam" -> 1620)
+    # Mengambil angka pertama dari string
+    df['Duration_Hours'] = df['Total Eksekusi (Jam/Hari)'].astype(str).str.extract(r'(\d+)').astype(float)
+    
+    # 2. Parsing Tanggal
+    df['Start_Date'] = pd.to_datetime(df['EXECUTION_PLAN_GENERAL'])
+    df['End_Date'] = df['Start_Date'] + pd.to_timedelta(df['Duration_Hours'], unit='h')
+    return df
+
+def parse_upload_job(job, files):
+    # Semua file & sheet dibaca paralel lalu digabung jadi satu jadwal field-wide
+    return ingest_files(job, files, parse_sheet, cache_ns='Smarts', dedup_col='PROG CODE')
+
 # --- CSS CUSTOM UNTUK HEADER ---
 st.markdown("""
     <style>
@@ -46,7 +73,7 @@ with st.sidebar:
     
     # 1. Input Data Excel
     st.subheader("1. Import Data")
-    uploaded_file = st.file_uploader("Upload File Excel/CSV", type=['xlsx', 'csv'])
+    uploaded_files = st.file_uploader("Upload File Excel/CSV (boleh beberapa file)", type=['xlsx', 'csv'], accept_multiple_files=True)
     
     # 2. Setting Parameter
     st.subheader("2. Parameter Filter")
@@ -68,6 +95,8 @@ with st.sidebar:
 
     st.info("💡 Logic: Prioritas tetap diurutkan berdasarkan Waktu Eksekusi Tercepat (Constraint Minimal).")
 
+    show_cache_stats(st)
+
 # --- HEADER LAYOUT (JUDUL, ANIMASI, LOGO) ---
 col_header_1, col_header_2, col_header_3 = st.columns([1, 4, 1])
 
@@ -93,22 +122,26 @@ with col_header_3:
 st.divider()
 
 # --- LOGIC PEMROSESAN DATA ---
-if uploaded_file is not None:
-    try:
-        # Baca file
-        if uploaded_file.name.endswith('.csv'):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
-
-        # 1. Parsing Durasi (Format "1620 Jam" -> 1620)
-        # Mengambil angka pertama dari string
-        df['Duration_Hours'] = df['Total Eksekusi (Jam/Hari)'].astype(str).str.extract(r'(\d+)').astype(float)
-        
-        # 2. Parsing Tanggal
-        df['Start_Date'] = pd.to_datetime(df['EXECUTION_PLAN_GENERAL'])
-        df['End_Date'] = df['Start_Date'] + pd.to_timedelta(df['Duration_Hours'], unit='h')
+# Parsing file jalan di background dan hanya sekali per file; perubahan slider
+# cukup memfilter ulang hasil parsing terakhir.
+df = None
+if uploaded_files:
+    files = [(f.name, f.getvalue()) for f in uploaded_files]
+    submit_job('parse', parse_upload_job, files,
+               params_key=tuple((name, bytes_key(data)) for name, data in files))
+    parse_res, _, parse_pending, parse_error = job_result('parse')
+    show_progress(parse_pending)
+    if parse_res is not None:
+        df, parse_timings = parse_res
+        show_ingest_timings(parse_timings, st.sidebar)
+    if parse_error is not None or (df is not None and df.empty):
+        if parse_error is not None:
+            st.error(f"Terjadi kesalahan saat memproses data: {parse_error}")
+        st.warning("Pastikan format kolom Excel sesuai: 'Total Eksekusi (Jam/Hari)', 'BOPD_RIGDAYS', 'HSRIG_NAME', 'EXECUTION_PLAN_GENERAL'")
+        df = None
 
+if df is not None:
+    try:
         # 3. Filter Data Berdasarkan Setting Sidebar
         df_filtered = df[
             (df['BOPD_RIGDAYS'] >= min_bopd) & 
@@ -185,7 +218,7 @@ if uploaded_file is not None:
         st.error(f"Terjadi kesalahan saat memproses data: {e}")
         st.warning("Pastikan format kolom Excel sesuai: 'Total Eksekusi (Jam/Hari)', 'BOPD_RIGDAYS', 'HSRIG_NAME', 'EXECUTION_PLAN_GENERAL'")
 
-else:
+elif not uploaded_files:
     # Tampilan awal jika belum upload file
     st.info("👋 Silakan upload file Excel 'Integrated_Minor_Action' melalui panel di sebelah kiri (Sidebar).")
     
@@ -195,4 +228,6 @@ else:
         <h3>Menunggu Input Data...</h3>
         <p>Gunakan tools di sidebar untuk memulai analisis Smart Schedule.</p>
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+poll_pending()
@@ -0,0 +1,160 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# --- SHARED CACHE LINTAS SESSION ---
+# Banyak planner membuka workbook 'Integrated_Minor_Action' yang sama. Hasil parse
+# dan jadwal disimpan sekali per proses server, dengan kunci hash workbook +
+# parameter engine, lalu dipakai bersama (read-only) oleh semua session.
+# Eviction LRU berdasarkan batas memori (env SMART_CACHE_MAX_MB).
+
+DEFAULT_MAX_MB = 512
+
+
+def estimate_size(value):
+    """Perkiraan ukuran memori (bytes) dari nilai yang disimpan di cache."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class SharedCache:
+    """
+    Cache LRU thread-safe dengan batas memori dan statistik hit/miss.
+    Nilai yang dikembalikan dipakai bersama antar session: JANGAN diubah in-place
+    (gunakan .copy() sebelum memodifikasi DataFrame).
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._inflight = {}            # key -> threading.Event (sedang dihitung)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # Nilai yang lebih besar dari batas total tidak disimpan sama sekali
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            self._evict()
+        return value
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def claim(self, key):
+        """
+        Cek cache dan daftarkan key sebagai sedang dihitung kalau belum ada.
+        Return (status, nilai): ('hit', value), ('owner', None) -> pemanggil wajib
+        fulfil()/release(), atau ('wait', event) -> session lain sedang menghitung.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return 'hit', self._entries[key][0]
+            waiter = self._inflight.get(key)
+            if waiter is not None:
+                return 'wait', waiter
+            self.misses += 1
+            self._inflight[key] = threading.Event()
+            return 'owner', None
+
+    def fulfil(self, key, value):
+        """Simpan hasil untuk key yang sudah di-claim dan bangunkan yang menunggu."""
+        try:
+            return self.put(key, value)
+        finally:
+            self.release(key)
+
+    def release(self, key):
+        """Lepas claim tanpa hasil (error/batal); penunggu akan menghitung sendiri."""
+        with self._lock:
+            waiter = self._inflight.pop(key, None)
+        if waiter is not None:
+            waiter.set()
+
+    def get_or_compute(self, key, compute):
+        """
+        Ambil dari cache, atau hitung sekali. Kalau session lain sedang menghitung
+        key yang sama, tunggu hasilnya (N user, file sama = 1 parse).
+        """
+        while True:
+            status, value = self.claim(key)
+            if status == 'hit':
+                return value
+            if status == 'owner':
+                break
+            value.wait()
+
+        try:
+            result = compute()
+        except BaseException:
+            self.release(key)
+            raise
+        return self.fulfil(key, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource
+def get_shared_cache():
+    """Satu instance cache per proses server, dipakai semua session."""
+    max_mb = float(os.environ.get('SMART_CACHE_MAX_MB', DEFAULT_MAX_MB))
+    return SharedCache(max_bytes=int(max_mb * 1024 * 1024))
+
+
+def show_cache_stats(container=st.sidebar):
+    s = get_shared_cache().stats()
+    with container.expander("📦 Shared Cache"):
+        st.caption(
+            f"{s['entries']} entri | {s['bytes'] / 1024**2:,.1f} / {s['max_bytes'] / 1024**2:,.0f} MB\n\n"
+            f"Hit: {s['hits']} | Miss: {s['misses']} | Hit rate: {s['hit_rate']:.0%} | Evicted: {s['evictions']}"
+        )
@@ -0,0 +1,213 @@
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import streamlit as st
+
+from smart_cache import get_shared_cache
+from smart_worker import bytes_key
+
+# --- INGEST MULTI-WORKBOOK / MULTI-SHEET ---
+# Satu workbook per area/field, masing-masing bisa punya beberapa sheet.
+# Pembacaan Excel (bagian paling lambat, openpyxl) dijalankan paralel di process
+# pool; normalisasi ke skema app, dedup dan merge dilakukan di background job.
+# Hasil normalisasi per file disimpan di shared cache (kunci: hash file).
+
+MAX_PROCESSES = min(4, os.cpu_count() or 1)
+TIMING_COLS = ['File', 'Sheets', 'Rows', 'Parse_Sec', 'Source', 'Errors']
+
+
+@st.cache_resource
+def get_process_pool(max_workers=MAX_PROCESSES):
+    # 'spawn' supaya child process tidak mewarisi thread server Streamlit
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def read_workbook(file_bytes, file_name):
+    """
+    Jalan di child process: baca SEMUA sheet dari satu file.
+    Return (dict sheet -> DataFrame, detik parse).
+    """
+    t0 = time.perf_counter()
+    if file_name.lower().endswith('.csv'):
+        sheets = {'csv': pd.read_csv(io.BytesIO(file_bytes))}
+    else:
+        sheets = pd.read_excel(io.BytesIO(file_bytes), sheet_name=None)
+    return sheets, time.perf_counter() - t0
+
+
+def _normalize_file(sheets, normalize):
+    """
+    Normalisasi semua sheet satu file. Sheet yang formatnya tidak dikenali
+    (mis. sheet ringkasan) dilewati; sheet yang error juga dilewati tanpa
+    menggagalkan file/upload lain. Return (DataFrame, list pesan error).
+    """
+    frames = []
+    errors = []
+    for sheet_name, sheet_df in sheets.items():
+        if sheet_df.empty:
+            continue
+        try:
+            norm = normalize(sheet_df)
+        except Exception as e:
+            errors.append(f"{sheet_name}: {e}")
+            continue
+        if norm is not None and not norm.empty:
+            frames.append(norm)
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    return df, errors
+
+
+def drop_duplicate_jobs(df, col='Job_ID', no_key=()):
+    """
+    Buang duplikat berdasarkan col (baris terakhir menang). Baris dengan key
+    kosong (NaN / string kosong / placeholder di no_key, mis. 'UNK') tidak
+    dianggap duplikat satu sama lain.
+    """
+    if df.empty or col not in df.columns:
+        return df
+    key = df[col]
+    key_str = key.astype(str).str.strip()
+    missing = key.isna() | key_str.eq('') | key_str.isin([str(v) for v in no_key])
+    dup = key.duplicated(keep='last') & ~missing
+    return df[~dup].reset_index(drop=True)
+
+
+def _read_one(data, name):
+    # Fallback sekuensial; file yang tidak bisa dibaca dikembalikan sebagai exception
+    try:
+        return read_workbook(data, name)
+    except Exception as e:
+        return e
+
+
+def _read_all(job, todo):
+    """
+    Baca file paralel di process pool; fallback sekuensial kalau pool tidak tersedia.
+    todo: list (idx, name, bytes). Yield (idx, (sheets, detik)) atau (idx, exception)
+    untuk file yang gagal dibaca, supaya file lain tetap diproses.
+    """
+    done = set()
+    try:
+        pool = get_process_pool()
+        futures = {pool.submit(read_workbook, data, name): idx for idx, name, data in todo}
+        try:
+            for fut in as_completed(futures):
+                job.check_cancelled()
+                try:
+                    result = fut.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    result = e
+                done.add(futures[fut])
+                yield futures[fut], result
+        finally:
+            for fut in futures:
+                fut.cancel()
+    except BrokenProcessPool:
+        get_process_pool.clear()
+        for idx, name, data in todo:
+            if idx in done:
+                continue
+            job.check_cancelled()
+            yield idx, _read_one(data, name)
+
+
+def _read_error_timing(name, error, secs=0.0, source='parsed'):
+    return {
+        'File': name, 'Sheets': 0, 'Rows': 0, 'Parse_Sec': round(secs, 3),
+        'Source': source, 'Errors': f"Gagal dibaca: {error}",
+    }
+
+
+def ingest_files(job, files, normalize, cache_ns, dedup_col='Job_ID', no_key=()):
+    """
+    Parse beberapa file (name, bytes) -> satu DataFrame gabungan (field-wide).
+    normalize(sheet_df) memetakan satu sheet ke skema app (DataFrame kosong = skip).
+    Duplikat dedup_col dibuang, baris dari file yang diupload belakangan menang
+    (baris dengan dedup_col kosong / placeholder no_key selalu dipertahankan).
+    Return (df_merged, df_timings).
+    """
+    cache = get_shared_cache()
+    keys = [(cache_ns, 'ingest', bytes_key(data)) for _, data in files]
+    normalized = {}
+    timings = {}
+    todo = []
+    waiting = []
+
+    # Key yang belum ada di cache di-claim dulu sebelum dikirim ke process pool,
+    # supaya session lain yang upload file sama menunggu hasil ini (1 parse saja)
+    for idx, (name, data) in enumerate(files):
+        status, value = cache.claim(keys[idx])
+        if status == 'hit':
+            normalized[idx] = value
+            timings[idx] = {'File': name, 'Sheets': None, 'Rows': len(value), 'Parse_Sec': 0.0, 'Source': 'cache', 'Errors': '-'}
+        elif status == 'owner':
+            todo.append((idx, name, data))
+        else:
+            waiting.append((idx, name, data))
+
+    n_total = max(len(files), 1)
+    claimed = {idx for idx, _, _ in todo}
+    try:
+        job.report(len(normalized) / n_total * 0.9, f"Membaca {len(todo)} file paralel...")
+        for idx, result in _read_all(job, todo):
+            name = files[idx][0]
+            if isinstance(result, Exception):
+                # Hasil gagal tidak di-cache; claim dilepas di finally
+                normalized[idx] = pd.DataFrame()
+                timings[idx] = _read_error_timing(name, result)
+                job.report(len(normalized) / n_total * 0.9, f"Gagal: {name}")
+                continue
+            sheets, secs = result
+            t0 = time.perf_counter()
+            df_file, errors = _normalize_file(sheets, normalize)
+            normalized[idx] = cache.fulfil(keys[idx], df_file)
+            claimed.discard(idx)
+            timings[idx] = {
+                'File': name, 'Sheets': len(sheets), 'Rows': len(df_file),
+                'Parse_Sec': round(secs + time.perf_counter() - t0, 3), 'Source': 'parsed',
+                'Errors': '; '.join(errors) or '-',
+            }
+            job.report(len(normalized) / n_total * 0.9, f"Selesai: {name}")
+    finally:
+        # Error / dibatalkan: lepas claim supaya penunggu menghitung sendiri
+        for idx in claimed:
+            cache.release(keys[idx])
+
+    # File yang sedang diparse session lain: tunggu hasilnya (atau parse sendiri
+    # kalau session itu gagal / dibatalkan)
+    for idx, name, data in waiting:
+        job.check_cancelled()
+        t0 = time.perf_counter()
+        parse = lambda: _normalize_file(read_workbook(data, name)[0], normalize)[0]
+        try:
+            normalized[idx] = cache.get_or_compute(keys[idx], parse)
+        except Exception as e:
+            normalized[idx] = pd.DataFrame()
+            timings[idx] = _read_error_timing(name, e, time.perf_counter() - t0, 'shared')
+            continue
+        timings[idx] = {
+            'File': name, 'Sheets': None, 'Rows': len(normalized[idx]),
+            'Parse_Sec': round(time.perf_counter() - t0, 3), 'Source': 'shared', 'Errors': '-',
+        }
+
+    # Merge sesuai urutan upload, lalu dedup
+    frames = [normalized[idx] for idx in range(len(files)) if not normalized[idx].empty]
+    merged = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    merged = drop_duplicate_jobs(merged, dedup_col, no_key)
+
+    df_timings = pd.DataFrame([timings[idx] for idx in range(len(files))], columns=TIMING_COLS)
+    return merged, df_timings
+
+
+def show_ingest_timings(df_timings, container=st.sidebar):
+    if df_timings is None or df_timings.empty:
+        return
+    with container.expander("⏱️ Waktu Parse per File"):
+        st.dataframe(df_timings, use_container_width=True, hide_index=True)
@@ -0,0 +1,264 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+# --- PENYIMPANAN RIWAYAT JADWAL (SQLITE LOKAL) ---
+# Data job yang sudah dinormalisasi + output engine disimpan sebagai snapshot
+# berversi di file SQLite (env SMART_STORE_PATH). Snapshot terakhir dimuat saat
+# session baru dibuka, dan dua snapshot bisa dibandingkan per Job_ID tanpa
+# parse ulang workbook.
+
+DEFAULT_PATH = "smart_schedule.db"
+KIND_JOBS = 'jobs'
+KIND_SCHEDULE = 'schedule'
+DATE_COLS = ['Start_Date', 'Finish_Date']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    app TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    label TEXT,
+    params TEXT,
+    n_jobs INTEGER
+);
+CREATE TABLE IF NOT EXISTS snapshot_rows (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(snapshot_id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    row_no INTEGER NOT NULL,
+    Job_ID TEXT,
+    Rig_Name TEXT,
+    Start_Date TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (snapshot_id, kind, row_no)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_app_created ON snapshots(app, created_at);
+CREATE INDEX IF NOT EXISTS idx_rows_job ON snapshot_rows(Job_ID, snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_rows_rig ON snapshot_rows(Rig_Name, snapshot_id);
+CREATE INDEX IF NOT EXISTS idx_rows_date ON snapshot_rows(Start_Date);
+"""
+
+
+def store_path():
+    return os.environ.get('SMART_STORE_PATH', DEFAULT_PATH)
+
+
+@st.cache_resource
+def _get_connection(path):
+    # Satu koneksi per file per proses server; schema cukup dibuat sekali
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+_db_lock = threading.RLock()
+
+
+@contextmanager
+def _db():
+    """Koneksi bersama (diserialisasi antar session) + transaksi."""
+    with _db_lock:
+        conn = _get_connection(store_path())
+        with conn:
+            yield conn
+
+
+def _records(df):
+    return json.loads(df.to_json(orient='records', date_format='iso', default_handler=str))
+
+
+def _insert_rows(conn, snapshot_id, kind, df):
+    # Simpan setiap baris sebagai JSON (kolom bebas per app) + kolom indeks
+    records = _records(df)
+    rows = []
+    for i, rec in enumerate(records):
+        job_id = rec.get('Job_ID')
+        rig = rec.get('Rig_Name')
+        rows.append((
+            snapshot_id, kind, i,
+            None if job_id is None else str(job_id),
+            None if rig is None else str(rig),
+            rec.get('Start_Date'),
+            json.dumps(rec),
+        ))
+    conn.executemany(
+        "INSERT INTO snapshot_rows (snapshot_id, kind, row_no, Job_ID, Rig_Name, Start_Date, data) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+
+
+def save_snapshot(app, jobs_df, schedule_df=None, label='', params=None):
+    """Simpan snapshot baru (job ternormalisasi + jadwal opsional). Return snapshot_id."""
+    with _db() as conn:
+        cur = conn.execute(
+            "INSERT INTO snapshots (app, created_at, label, params, n_jobs) VALUES (?, ?, ?, ?, ?)",
+            (app, datetime.now().isoformat(timespec='seconds'), label,
+             json.dumps(params or {}, default=str), len(jobs_df)),
+        )
+        snapshot_id = cur.lastrowid
+        _insert_rows(conn, snapshot_id, KIND_JOBS, jobs_df)
+        if schedule_df is not None:
+            _insert_rows(conn, snapshot_id, KIND_SCHEDULE, schedule_df)
+    return snapshot_id
+
+
+def _has_schedule(conn, snapshot_id):
+    row = conn.execute(
+        "SELECT 1 FROM snapshot_rows WHERE snapshot_id = ? AND kind = ? LIMIT 1",
+        (snapshot_id, KIND_SCHEDULE),
+    ).fetchone()
+    return row is not None
+
+
+def attach_schedule(snapshot_id, schedule_df, params=None):
+    """
+    Tambahkan output engine ke snapshot yang BELUM punya jadwal.
+    Snapshot yang sudah punya jadwal tidak pernah ditulis ulang; return False.
+    """
+    with _db() as conn:
+        if _has_schedule(conn, snapshot_id):
+            return False
+        _insert_rows(conn, snapshot_id, KIND_SCHEDULE, schedule_df)
+        if params is not None:
+            conn.execute("UPDATE snapshots SET params = ? WHERE snapshot_id = ?",
+                         (json.dumps(params, default=str), snapshot_id))
+    return True
+
+
+def record_schedule(app, snapshot_id, jobs_df, schedule_df, params=None):
+    """
+    Simpan output engine untuk data snapshot_id. Kalau snapshot itu sudah punya
+    jadwal yang berbeda (mis. dihitung ulang di hari lain), buat snapshot baru
+    supaya riwayat lama tetap utuh. Return snapshot_id yang memuat jadwal ini.
+    """
+    if attach_schedule(snapshot_id, schedule_df, params):
+        return snapshot_id
+
+    with _db() as conn:
+        stored = [r[0] for r in conn.execute(
+            "SELECT data FROM snapshot_rows WHERE snapshot_id = ? AND kind = ? ORDER BY row_no",
+            (snapshot_id, KIND_SCHEDULE),
+        )]
+    if stored == [json.dumps(rec) for rec in _records(schedule_df)]:
+        return snapshot_id
+    return save_snapshot(app, jobs_df, schedule_df, label=f"recompute #{snapshot_id}", params=params)
+
+
+def list_snapshots(app):
+    with _db() as conn:
+        return pd.read_sql_query(
+            "SELECT snapshot_id, created_at, label, n_jobs, params FROM snapshots "
+            "WHERE app = ? ORDER BY snapshot_id DESC",
+            conn, params=(app,),
+        )
+
+
+def latest_snapshot_id(app):
+    with _db() as conn:
+        row = conn.execute(
+            "SELECT MAX(snapshot_id) FROM snapshots WHERE app = ?", (app,)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def load_snapshot(snapshot_id, kind=KIND_JOBS):
+    """Muat isi snapshot sebagai DataFrame (urutan baris sama seperti saat disimpan)."""
+    with _db() as conn:
+        rows = conn.execute(
+            "SELECT data FROM snapshot_rows WHERE snapshot_id = ? AND kind = ? ORDER BY row_no",
+            (snapshot_id, kind),
+        ).fetchall()
+    df = pd.DataFrame([json.loads(r[0]) for r in rows])
+    for col in DATE_COLS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col]).dt.date
+    return df
+
+
+def diff_snapshots(old_id, new_id, kind=KIND_JOBS):
+    """
+    Bandingkan dua snapshot per Job_ID.
+    Status: Added / Removed / Changed (dengan daftar kolom yang berubah).
+    Job_ID ganda dalam satu snapshot: baris terakhir yang dipakai.
+    """
+    old = load_snapshot(old_id, kind)
+    new = load_snapshot(new_id, kind)
+    if old.empty and new.empty:
+        return pd.DataFrame(columns=['Job_ID', 'Rig_Name', 'Status', 'Changed_Fields'])
+
+    def by_job(df):
+        if df.empty:
+            return pd.DataFrame()
+        df = df.astype({'Job_ID': str}).drop_duplicates('Job_ID', keep='last')
+        return df.set_index('Job_ID')
+
+    old, new = by_job(old), by_job(new)
+    compare_cols = [c for c in new.columns if c in old.columns]
+
+    diff_list = []
+    for job_id in new.index.difference(old.index):
+        diff_list.append({'Job_ID': job_id, 'Rig_Name': new.at[job_id, 'Rig_Name'], 'Status': 'Added', 'Changed_Fields': '-'})
+    for job_id in old.index.difference(new.index):
+        diff_list.append({'Job_ID': job_id, 'Rig_Name': old.at[job_id, 'Rig_Name'], 'Status': 'Removed', 'Changed_Fields': '-'})
+    for job_id in new.index.intersection(old.index):
+        changed = []
+        for col in compare_cols:
+            a, b = old.at[job_id, col], new.at[job_id, col]
+            if pd.isna(a) and pd.isna(b):
+                continue
+            if str(a) != str(b):
+                changed.append(f"{col}: {a} → {b}")
+        if changed:
+            diff_list.append({'Job_ID': job_id, 'Rig_Name': new.at[job_id, 'Rig_Name'], 'Status': 'Changed', 'Changed_Fields': '; '.join(changed)})
+
+    return pd.DataFrame(diff_list, columns=['Job_ID', 'Rig_Name', 'Status', 'Changed_Fields'])
+
+
+def show_history_panel(app):
+    """
+    Panel riwayat snapshot + diff. Return DataFrame job dari snapshot yang
+    dipilih untuk dimuat ulang, atau None.
+    Diff hanya dihitung saat tombol ditekan, lalu disimpan di session_state,
+    jadi rerun biasa (termasuk polling background job) tidak memuat snapshot.
+    """
+    snaps = list_snapshots(app)
+    with st.expander("🗂️ Riwayat Snapshot & Perbandingan"):
+        if snaps.empty:
+            st.caption("Belum ada snapshot tersimpan.")
+            return None
+
+        labels = {
+            r.snapshot_id: f"#{r.snapshot_id} | {r.created_at} | {r.label or '-'} ({r.n_jobs} job)"
+            for r in snaps.itertuples()
+        }
+        ids = list(labels)
+        c1, c2, c3 = st.columns([2, 2, 1])
+        old_id = c1.selectbox("Snapshot lama", ids, index=min(1, len(ids) - 1), format_func=labels.get, key=f'{app}_diff_old')
+        new_id = c2.selectbox("Snapshot baru", ids, index=0, format_func=labels.get, key=f'{app}_diff_new')
+        kind = c3.radio("Bandingkan", [KIND_JOBS, KIND_SCHEDULE], key=f'{app}_diff_kind')
+
+        diff_state = f'{app}_diff_result'
+        if st.button("🔍 Bandingkan", key=f'{app}_diff_run'):
+            st.session_state[diff_state] = ((old_id, new_id, kind), diff_snapshots(old_id, new_id, kind))
+
+        diff_key, diff = st.session_state.get(diff_state, (None, None))
+        if diff is not None and diff_key == (old_id, new_id, kind):
+            counts = diff['Status'].value_counts()
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Added", int(counts.get('Added', 0)))
+            m2.metric("Removed", int(counts.get('Removed', 0)))
+            m3.metric("Changed", int(counts.get('Changed', 0)))
+            st.dataframe(diff, use_container_width=True)
+
+        if st.button(f"↩️ Muat Snapshot #{new_id}", key=f'{app}_load_snapshot'):
+            return load_snapshot(new_id, KIND_JOBS)
+    return None
@@ -0,0 +1,233 @@
+import hashlib
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+# --- BACKGROUND WORKER UNTUK KOMPUTASI BERAT ---
+# Parse Excel, preprocess, engine penjadwalan dan export dijalankan di thread pool
+# supaya script Streamlit tidak freeze. Setiap "slot" (mis. 'upload', 'schedule')
+# hanya punya satu job aktif per session; job lama otomatis dibatalkan saat
+# parameter berubah, dan hasil terakhir yang sudah selesai tetap ditampilkan.
+
+# Ukuran thread pool (dipakai bersama semua session), bisa diatur lewat env
+MAX_WORKERS = int(os.environ.get('SMART_WORKER_THREADS', 4))
+POLL_INTERVAL = 0.5  # detik, jeda refresh progress / cek job selesai
+
+_job_counter = itertools.count(1)
+
+
+class JobCancelled(Exception):
+    """Dilempar di dalam job ketika run sudah basi (digantikan run yang lebih baru)."""
+
+
+class JobHandle:
+    """Handle satu job: progress, pesan status, pembatalan dan future hasil."""
+
+    def __init__(self, slot, params_key):
+        self.job_id = next(_job_counter)
+        self.slot = slot
+        self.params_key = params_key
+        self.progress = 0.0
+        self.message = "Menunggu antrian..."
+        self.future = None
+        self._cancel = threading.Event()
+
+    def report(self, progress, message=None):
+        """Dipanggil dari dalam job. Sekaligus titik cek pembatalan."""
+        self.check_cancelled()
+        self.progress = max(0.0, min(float(progress), 1.0))
+        if message:
+            self.message = message
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.slot}#{self.job_id} dibatalkan")
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+
+@st.cache_resource
+def get_executor(max_workers=MAX_WORKERS):
+    """Thread pool dipakai bersama oleh semua session (satu per proses server)."""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="smart-worker")
+
+
+def _run_job(handle, fn, args, kwargs):
+    handle.report(0.0, "Memproses...")
+    result = fn(handle, *args, **kwargs)
+    handle.report(1.0, "Selesai")
+    return result
+
+
+def bytes_key(data):
+    """Kunci ringkas untuk isi file (upload) supaya tidak diparse ulang tiap rerun."""
+    return hashlib.sha1(data).hexdigest()
+
+
+def frame_key(df):
+    """Kunci ringkas untuk DataFrame (isi + kolom + urutan baris)."""
+    if df.empty:
+        return ("empty", tuple(df.columns))
+    # Hash per baris digabung sesuai urutan: engine memecah tie berdasarkan urutan input,
+    # jadi data yang sama dengan urutan berbeda harus dapat kunci berbeda.
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    return (tuple(df.columns), hashlib.sha1(row_hashes.tobytes()).hexdigest())
+
+
+def _jobs():
+    if '_bg_jobs' not in st.session_state:
+        st.session_state['_bg_jobs'] = {}
+    return st.session_state['_bg_jobs']
+
+
+def _results():
+    if '_bg_results' not in st.session_state:
+        st.session_state['_bg_results'] = {}
+    return st.session_state['_bg_results']
+
+
+def _debounce():
+    # slot -> {'key': params_key, 'since': waktu pertama params ini terlihat,
+    #          'debounce': detik, 'touched': dipanggil di run ini}
+    if '_bg_debounce' not in st.session_state:
+        st.session_state['_bg_debounce'] = {}
+    return st.session_state['_bg_debounce']
+
+
+def submit_job(slot, fn, *args, params_key, debounce=0.0, **kwargs):
+    """
+    Jalankan fn(handle, *args, **kwargs) di background untuk slot tertentu.
+    Kalau params_key sama dengan job yang sudah ada, job itu dipakai ulang
+    (tidak dihitung ulang di setiap rerun). Kalau berbeda, job lama dibatalkan.
+    Debounce dilakukan di session (bukan di thread pool): job baru baru dikirim
+    setelah params_key tidak berubah selama `debounce` detik. Selama menunggu
+    return None dan poll_pending() me-rerun script begitu jeda habis.
+    """
+    jobs = _jobs()
+    current = jobs.get(slot)
+    if current is not None and current.params_key == params_key and not current.cancelled:
+        return current
+    if current is not None:
+        cancel_job(slot)
+
+    if debounce > 0:
+        waiting = _debounce()
+        entry = waiting.get(slot)
+        now = time.monotonic()
+        if entry is None or entry['key'] != params_key:
+            waiting[slot] = {'key': params_key, 'since': now, 'debounce': debounce, 'touched': True}
+            return None
+        if now - entry['since'] < debounce:
+            entry['touched'] = True
+            return None
+        waiting.pop(slot, None)
+
+    handle = JobHandle(slot, params_key)
+    handle.future = get_executor().submit(_run_job, handle, fn, args, kwargs)
+    jobs[slot] = handle
+    return handle
+
+
+def cancel_job(slot):
+    handle = _jobs().pop(slot, None)
+    if handle is not None:
+        handle.cancel()
+
+
+def job_result(slot):
+    """
+    Return (hasil_terakhir, params_key_hasil, job_pending, error).
+    hasil_terakhir adalah hasil job terakhir yang selesai, jadi UI tetap bisa
+    menampilkan jadwal lama sementara job baru masih dihitung.
+    """
+    handle = _jobs().get(slot)
+    results = _results()
+    error = None
+    pending = None
+
+    if handle is not None:
+        if not handle.done():
+            pending = handle
+            handle.reported_pending = True
+        elif not handle.cancelled and not getattr(handle, 'collected', False):
+            handle.collected = True
+            try:
+                results[slot] = (handle.params_key, handle.future.result())
+            except JobCancelled:
+                pass
+            except Exception as e:
+                handle.error = e
+        error = getattr(handle, 'error', None)
+
+    params_key, value = results.get(slot, (None, None))
+    return value, params_key, pending, error
+
+
+def clear_result(slot):
+    cancel_job(slot)
+    _debounce().pop(slot, None)
+    _results().pop(slot, None)
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def _progress_fragment(handle):
+    # Hanya progress bar yang di-refresh berkala, bukan seluruh halaman
+    st.progress(handle.progress, text=f"⏳ {handle.message}")
+
+
+def show_progress(handle, container=st):
+    if handle is None:
+        return
+    if container is st:
+        _progress_fragment(handle)
+    else:
+        with container:
+            _progress_fragment(handle)
+
+
+@st.fragment(run_every=POLL_INTERVAL)
+def _watch_pending(handles, deadline):
+    # Full rerun hanya saat ada job selesai atau jeda debounce habis
+    if any(h.done() for h in handles) or (deadline is not None and time.monotonic() >= deadline):
+        st.rerun()
+
+
+def poll_pending():
+    """
+    Panggil di akhir script. Selama masih ada job berjalan / debounce, sebuah
+    fragment mengecek tiap POLL_INTERVAL dan baru me-rerun seluruh script
+    ketika ada hasil baru (bukan rerun penuh setiap interval).
+    """
+    # Debounce yang tidak lagi diminta di run ini (mis. data dikosongkan) dibuang
+    waiting = _debounce()
+    for slot in [s for s, e in waiting.items() if not e['touched']]:
+        del waiting[slot]
+    for entry in waiting.values():
+        entry['touched'] = False
+
+    # Job yang di run ini dilaporkan pending tapi sudah selesai sebelum titik ini
+    # juga ditunggu, supaya hasilnya tidak "tertinggal" sampai interaksi berikutnya
+    running = [
+        h for h in _jobs().values()
+        if not h.done() or (getattr(h, 'reported_pending', False) and not getattr(h, 'collected', False))
+    ]
+    for h in _jobs().values():
+        h.reported_pending = False
+    deadline = min((e['since'] + e['debounce'] for e in waiting.values()), default=None)
+    if running or deadline is not None:
+        _watch_pending(running, deadline)